@@ -1,16 +1,19 @@
 from __future__ import annotations
 
-import json, os, re
+import asyncio
+import atexit
+import os, re, signal, time
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
 
-import requests
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+import httpx
+import orjson
 from dotenv import load_dotenv
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.error import Forbidden
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 from zoneinfo import ZoneInfo  # חדש: תמיכה באזור זמן מקומי
 
 load_dotenv()
@@ -31,14 +34,13 @@ SUBSCRIBERS_FILE = "subscribers.json"
 PROCESSED_FILE = "processed_events.json"
 
 # (יוגדרו בזמן main)
-SCHEDULER: Optional[BackgroundScheduler] = None
 SCHED_JOB_ID = "poll-job"
 APPLICATION: Optional[Application] = None
 
 if not TELEGRAM_BOT_TOKEN:
     raise SystemExit("Missing TELEGRAM_BOT_TOKEN (set it in Render → Environment).")
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MacroEvent:
     id_key: str
     country: str
@@ -52,58 +54,102 @@ class MacroEvent:
     release_time_utc: datetime
     source: Optional[str]
     source_url: Optional[str]
+    category_lc: str = ""  # מחושב פעם אחת ב-fetch_calendar עבור המסווג
 
 def _load_json(path: str, default: Any) -> Any:
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     except Exception:
         return default
 
+# cache בזיכרון לפי mtime כדי לא לקרוא את קבצי ה-JSON מחדש בכל poll/פקודה
+_json_cache: Dict[str, tuple] = {}
+
+def _load_json_cached(path: str, default: Any) -> Any:
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return default
+    cached = _json_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    val = _load_json(path, default)
+    _json_cache[path] = (mtime, val)
+    return val
+
 def _save_json(path: str, obj: Any) -> None:
     tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2, default=str)
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str))
     os.replace(tmp, path)
+    try:
+        _json_cache[path] = (os.stat(path).st_mtime, obj)
+    except OSError:
+        _json_cache.pop(path, None)
 
 def get_config() -> Dict[str, Any]:
-    cfg = _load_json(CONFIG_FILE, {})
+    cfg = _load_json_cached(CONFIG_FILE, {})
     merged = {**DEFAULT_CONFIG, **cfg}
-    # שמירה כדי ליצור קובץ אם לא קיים
-    _save_json(CONFIG_FILE, merged)
+    # כתיבה רק כשחסרים מפתחות בקובץ (למשל בהרצה הראשונה)
+    if merged != cfg:
+        _save_json(CONFIG_FILE, merged)
     return merged
 
 class TradingEconomicsProvider:
     BASE = "https://api.tradingeconomics.com"
 
-    def __init__(self, client: str):
+    def __init__(self, client: str, http: Optional[httpx.AsyncClient] = None):
         self.client = client
-
-    def fetch_calendar(self, start: datetime, end: datetime, country: str, high_impact_only: bool = True) -> List[MacroEvent]:
+        # חיבור קבוע (keep-alive) — חוסך TCP+TLS handshake בכל poll;
+        # אפשר להזריק client משותף מבחוץ (למשל מה-lifespan של השרת)
+        self._client = http or httpx.AsyncClient(
+            timeout=20,
+            transport=httpx.AsyncHTTPTransport(retries=2),
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=1),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def fetch_calendar(self, start: datetime, end: datetime, country: str, high_impact_only: bool = True,
+                             skip: Optional[Callable[[str], bool]] = None) -> List[MacroEvent]:
+        # d1/d2 ברזולוציית דקות — מצמצם את התשובה מחלון של יום שלם
+        # לחלון ה-poll בלבד, והפענוח של ה-JSON מתקצר בהתאם
         params = {
-            "start": start.strftime("%Y-%m-%d"),
-            "end": end.strftime("%Y-%m-%d"),
+            "d1": start.isoformat(timespec="minutes")[:16],
+            "d2": end.isoformat(timespec="minutes")[:16],
             "country": country,
             "c": self.client,
         }
         if high_impact_only:
             params["importance"] = 3
-        r = requests.get(f"{self.BASE}/calendar", params=params, timeout=20)
+        r = await self._client.get(f"{self.BASE}/calendar", params=params)
         r.raise_for_status()
         data = r.json()
         events: List[MacroEvent] = []
         for item in data:
-            dt_str = item.get("Date") or item.get("DateUTC")
+            # שליפה אחת של כל מפתח — משמשת גם ל-id וגם לבניית האירוע
+            raw_date = item.get("Date") or item.get("DateUTC") or ""
+            cat = item.get("Category")
+            name = item.get("Event") or cat or "Unknown Event"
+            ev_country = item.get("Country") or country
+            id_key = f"{ev_country}|{name}|{raw_date.replace(' ', 'T', 1)}"
+            # סינון מוקדם לפי id — רוב הפריטים בחלון חוזרים בין polls,
+            # ואין טעם לשלם strptime + בניית dataclass עליהם
+            if skip is not None and skip(id_key):
+                continue
+            dt_str = raw_date
             if not dt_str:
-                date_part = item.get("Date") or item.get("date")
+                date_part = item.get("date")
                 time_part = item.get("Time") or item.get("time") or "00:00"
                 dt_str = f"{date_part} {time_part}"
             release_time_utc = _parse_te_datetime(dt_str)
             ev = MacroEvent(
-                id_key=_build_id(item),
-                country=item.get("Country") or country,
-                name=item.get("Event") or item.get("Category", "Unknown Event"),
-                category=item.get("Category"),
+                id_key=id_key,
+                country=ev_country,
+                name=name,
+                category=cat,
                 actual=item.get("Actual"),
                 forecast=item.get("Forecast"),
                 previous=item.get("Previous"),
@@ -112,33 +158,67 @@ class TradingEconomicsProvider:
                 release_time_utc=release_time_utc,
                 source=item.get("Source"),
                 source_url=item.get("SourceURL"),
+                category_lc=(cat or name or "").lower(),
             )
             events.append(ev)
         return events
 
-def _parse_te_datetime(dt_str: str) -> datetime:
+# אותן מחרוזות תאריך חוזרות בין פריטים ובין מחזורי poll (חלון חופף) —
+# memoization חוסך את לולאת ה-strptime החוזרת; ה-fallback ("עכשיו")
+# מחושב מחוץ ל-cache כדי שלא יוקפא
+@lru_cache(maxsize=4096)
+def _parse_te_datetime_cached(dt_str: str) -> Optional[datetime]:
     s = dt_str.replace("T", " ").replace("Z", "")
-    for fmt in ["%Y-%m-%d %H:%M:%S","%Y-%m-%d %H:%M","%Y-%m-%d","%m/%d/%Y %H:%M:%S","%m/%d/%Y %H:%M"]:
+    for fmt in ("%Y-%m-%d %H:%M:%S","%Y-%m-%d %H:%M","%Y-%m-%d","%m/%d/%Y %H:%M:%S","%m/%d/%Y %H:%M"):
         try:
             return datetime.strptime(s, fmt).replace(tzinfo=timezone.utc)
         except ValueError:
             pass
-    return datetime.now(timezone.utc)
+    return None
 
-def _build_id(item: Dict[str, Any]) -> str:
-    date_key = (item.get("Date") or item.get("DateUTC") or "").replace(" ", "T")
-    name_key = item.get("Event") or item.get("Category") or "Unknown"
-    country = item.get("Country") or "NA"
-    return f"{country}|{name_key}|{date_key}"
+def _parse_te_datetime(dt_str: str) -> datetime:
+    return _parse_te_datetime_cached(dt_str) or datetime.now(timezone.utc)
+
+# מנוע regex מבוסס DFA (google-re2) אם מותקן; אחרת re הסטנדרטי
+try:
+    import re2 as _re
+except ImportError:
+    _re = re
+
+_value_num_pat = _re.compile(r"(-?\d+(?:\.\d+)?)")
+
+# מסווג קטגוריה במעבר regex אחד במקום סדרת בדיקות substring;
+# שם הקבוצה שתפסה (lastgroup) קובע את הטאג ואת כיוון הפרשנות
+_CAT_RE = _re.compile(
+    r"(?P<inflation>cpi|ppi|inflation)"
+    r"|(?P<growth>gdp|growth)"
+    r"|(?P<labor_dovish>unemployment|jobless)"
+    r"|(?P<labor_hawkish>non-?farm|payroll)"
+    r"|(?P<rates>rate decision|interest rate|fomc)"
+)
+_CAT_TAG = {
+    "inflation": "inflation",
+    "growth": "growth",
+    "labor_dovish": "labor",
+    "labor_hawkish": "labor",
+    "rates": "rates",
+}
+# כיוון הפרשנות של הפתעה חיובית לפי קטגוריה; ברירת המחדל ניצית (+1)
+_CAT_SIGN = {"labor_dovish": -1}
 
-_value_num_pat = re.compile(r"(-?\d+(?:\.\d+)?)")
+# כפל לפי סיומת סדר-גודל; בדיקת תו אחרון אחת במקום שתי סריקות endswith
+_SUFFIX_MULT = {"K": 1e3, "k": 1e3, "M": 1e6, "m": 1e6, "B": 1e9, "b": 1e9}
 
 def parse_number(v: Optional[str]) -> Optional[float]:
     if v is None: return None
     s = str(v).strip().replace(",", "")
-    mult = 1.0
-    if s.upper().endswith("K"): mult, s = 1_000.0, s[:-1]
-    if s.upper().endswith("M"): mult, s = 1_000_000.0, s[:-1]
+    if not s: return None
+    mult = _SUFFIX_MULT.get(s[-1], 1.0)
+    if mult != 1.0:
+        s = s[:-1]
+    # רוב הערכים הם מספר נקי ("3.2") — float ישיר לפני נפילה ל-regex
+    try: return float(s) * mult
+    except ValueError: pass
     m = _value_num_pat.search(s)
     if not m: return None
     try: return float(m.group(1)) * mult
@@ -152,37 +232,19 @@ def interpret_event(ev: MacroEvent, local_tz: str) -> Dict[str, Any]:
     if actual is not None and forecast is not None:
         surprise = actual - forecast
 
-    category = (ev.category or ev.name or "").lower()
+    category = ev.category_lc or (ev.category or ev.name or "").lower()
     tags: List[str] = []
     direction = "neutral"; score = 0; nuance: List[str] = []
 
-    def hawkish_if_positive(s: Optional[float]):
-        nonlocal direction, score
-        if s is None: return
-        if s > 0: direction, score = "hawkish", max(score, 1)
-        elif s < 0: direction, score = "dovish", min(score, -1)
-
-    def dovish_if_positive(s: Optional[float]):
-        nonlocal direction, score
-        if s is None: return
-        if s > 0: direction, score = "dovish", min(score, -1)
-        elif s < 0: direction, score = "hawkish", max(score, 1)
-
-    if any(k in category for k in ["cpi","core cpi","ppi","inflation"]):
-        tags.append("inflation")
-        if surprise is not None:
-            hawkish_if_positive(surprise)
-            nuance.append("inflation surprise: " + ("hotter" if surprise > 0 else "cooler"))
-    elif "gdp" in category or "growth" in category:
-        tags.append("growth"); hawkish_if_positive(surprise)
-    elif "unemployment" in category or "jobless" in category:
-        tags.append("labor"); dovish_if_positive(surprise)
-    elif "non-farm" in category or "nonfarm" in category or "payroll" in category:
-        tags.append("labor"); hawkish_if_positive(surprise)
-    elif "rate decision" in category or "interest rate" in category or "fomc" in category:
-        tags.append("rates"); hawkish_if_positive(surprise)
-    else:
-        tags.append("other"); hawkish_if_positive(surprise)
+    m = _CAT_RE.search(category)
+    group = m.lastgroup if m else None
+    tags.append(_CAT_TAG.get(group, "other"))
+    if surprise is not None and surprise != 0:
+        sign = _CAT_SIGN.get(group, 1)
+        score = sign if surprise > 0 else -sign
+        direction = "hawkish" if score > 0 else "dovish"
+    if group == "inflation" and surprise is not None:
+        nuance.append("inflation surprise: " + ("hotter" if surprise > 0 else "cooler"))
 
     if actual is not None and previous is not None:
         if actual > previous: nuance.append("rising vs previous")
@@ -222,40 +284,95 @@ def interpret_event(ev: MacroEvent, local_tz: str) -> Dict[str, Any]:
     details.append("Interpretation: " + ( "hawkish tilt (tighter conditions likelier)" if direction=="hawkish" else "dovish tilt (easier conditions likelier)" if direction=="dovish" else "neutral/unclear"))
     if nuance: details.append("Notes: " + "; ".join(nuance))
 
-    return {"direction": direction, "score": score, "summary": summary, "details": details, "tags": tags}
+    # ההודעה המוכנה נבנית כאן פעם אחת — החוצה לא יוצאת איטרציה נוספת
+    text = summary + "\n" + "\n".join("• " + d for d in details) + "\n"
+    return {"direction": direction, "score": score, "summary": summary, "details": details, "tags": tags, "text": text}
 
 provider = TradingEconomicsProvider(TE_CLIENT)
 
-def poll_and_notify(app: Application) -> None:
+# מנויים — set בזיכרון שנטען פעם אחת; נשמר (ממוין) רק בהרשמה/ביטול
+_subs: set = set(_load_json(SUBSCRIBERS_FILE, []))
+
+def _save_subs() -> None:
+    _save_json(SUBSCRIBERS_FILE, sorted(_subs))
+
+# אירועים שכבר נשלחו — dict של id_key -> זמן פרסום (ISO), תחום ל-7 ימים
+# אחורה כדי שהקובץ לא יגדל בלי גבול; נטען פעם אחת ונשמר רק כשיש שינוי
+PROCESSED_MAX_AGE = timedelta(days=7)
+_processed: Optional[Dict[str, str]] = None
+
+def _get_processed() -> Dict[str, str]:
+    global _processed
+    if _processed is None:
+        raw = _load_json(PROCESSED_FILE, {})
+        if isinstance(raw, list):
+            # פורמט ישן: רשימת מפתחות בלבד — מסומנים כ"עכשיו" וייפוגו בהמשך
+            now_iso = datetime.now(timezone.utc).isoformat()
+            raw = {k: now_iso for k in raw}
+        cutoff = (datetime.now(timezone.utc) - PROCESSED_MAX_AGE).isoformat()
+        _processed = {k: t for k, t in raw.items() if t >= cutoff}
+    return _processed
+
+# הכתיבה לדיסק נדחית ומאוגדת — פעם ב-5 דקות לכל היותר, ותמיד ביציאה
+PROCESSED_FLUSH_SECONDS = 300
+_processed_dirty = False
+_processed_last_flush = 0.0
+
+def _flush_processed(force: bool = True) -> None:
+    global _processed_dirty, _processed_last_flush
+    if _processed is None or not _processed_dirty:
+        return
+    if not force and time.monotonic() - _processed_last_flush < PROCESSED_FLUSH_SECONDS:
+        return
+    _save_json(PROCESSED_FILE, _processed)
+    _processed_dirty = False
+    _processed_last_flush = time.monotonic()
+
+atexit.register(_flush_processed)
+
+# תקרת מקביליות לשליחות — שומר על מרחק מה-rate limit של טלגרם
+_SEND_SEMAPHORE = asyncio.Semaphore(30)
+
+async def _send_to_sub(bot, chat_id: int, text: str) -> Optional[int]:
+    async with _SEND_SEMAPHORE:
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+        except Forbidden:
+            return chat_id  # המשתמש חסם את הבוט — יוסר מהרשימה
+        except Exception as e:
+            print(f"[notify] send error ({chat_id}): {e}")
+    return None
+
+async def poll_and_notify(context: ContextTypes.DEFAULT_TYPE) -> None:
+    global _processed_dirty
     cfg = get_config()
     now = datetime.now(timezone.utc)
     start = now - timedelta(minutes=cfg["window_minutes"])
     end = now + timedelta(minutes=1)
+    processed = _get_processed()
     try:
-        events = provider.fetch_calendar(start, end, cfg["country"], cfg["high_impact_only"])
+        events = await provider.fetch_calendar(start, end, cfg["country"], cfg["high_impact_only"],
+                                               skip=processed.__contains__)
     except Exception as e:
         print(f"[poll] fetch error: {e}")
         return
 
-    processed = set(_load_json(PROCESSED_FILE, []))
-    subs = _load_json(SUBSCRIBERS_FILE, [])
-    if not subs: return
+    if not _subs: return
 
     for ev in events:
         if not ev.actual or str(ev.actual).strip() == "": continue
         if ev.release_time_utc > now + timedelta(minutes=1): continue
-        if ev.id_key in processed: continue
 
-        analysis = interpret_event(ev, cfg["local_tz"])
-        msg = analysis["summary"] + "\n" + "\n".join("• " + d for d in analysis["details"]) + "\n"
-        try:
-            for chat_id in subs:
-                app.create_task(app.bot.send_message(chat_id=chat_id, text=msg))
-            processed.add(ev.id_key)
-        except Exception as e:
-            print(f"[notify] send error: {e}")
+        msg = interpret_event(ev, cfg["local_tz"])["text"]
+        results = await asyncio.gather(*(_send_to_sub(context.bot, cid, msg) for cid in tuple(_subs)))
+        dead = [cid for cid in results if cid is not None]
+        if dead:
+            _subs.difference_update(dead)
+            _save_subs()
+        processed[ev.id_key] = ev.release_time_utc.isoformat()
+        _processed_dirty = True
 
-    _save_json(PROCESSED_FILE, list(processed))
+    _flush_processed(force=False)
 
 # ===== פקודות טלגרם =====
 
@@ -288,29 +405,26 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
-    subs = _load_json(SUBSCRIBERS_FILE, [])
-    if chat_id not in subs:
-        subs.append(chat_id)
-        _save_json(SUBSCRIBERS_FILE, subs)
+    if chat_id not in _subs:
+        _subs.add(chat_id)
+        _save_subs()
         await context.bot.send_message(chat_id=chat_id, text="נרשמת לעדכוני מאקרו (US, high-impact).")
     else:
         await context.bot.send_message(chat_id=chat_id, text="כבר היית רשום.")
 
 async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
-    subs = _load_json(SUBSCRIBERS_FILE, [])
-    if chat_id in subs:
-        subs.remove(chat_id)
-        _save_json(SUBSCRIBERS_FILE, subs)
+    if chat_id in _subs:
+        _subs.discard(chat_id)
+        _save_subs()
         await context.bot.send_message(chat_id=chat_id, text="הוסרנו מרשימת העדכונים.")
     else:
         await context.bot.send_message(chat_id=chat_id, text="לא היית רשום.")
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     cfg = get_config()
-    subs = _load_json(SUBSCRIBERS_FILE, [])
     msg = (
-        f"Subscribers: {len(subs)}\n"
+        f"Subscribers: {len(_subs)}\n"
         f"Country: {cfg['country']}\n"
         f"High-impact only: {cfg['high_impact_only']}\n"
         f"Polling: every {cfg['poll_every_seconds']}s; window={cfg['window_minutes']}m\n"
@@ -331,7 +445,7 @@ async def today(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     start_utc = datetime(now.year, now.month, now.day, 0, 0, tzinfo=tz).astimezone(timezone.utc)
     end_utc = (start_utc + timedelta(days=1)) - timedelta(seconds=1)
     try:
-        events = provider.fetch_calendar(start_utc, end_utc, cfg["country"], cfg["high_impact_only"])
+        events = await provider.fetch_calendar(start_utc, end_utc, cfg["country"], cfg["high_impact_only"])
     except Exception as e:
         await context.bot.send_message(chat_id=update.effective_chat.id, text=f"שגיאת משיכה: {e}")
         return
@@ -354,6 +468,23 @@ async def today(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if chunk:
         await context.bot.send_message(chat_id=update.effective_chat.id, text=chunk)
 
+# PTB דוחה שמות פקודה שאינם ASCII ב-CommandHandler, אז הכינויים בעברית
+# נתפסים כהודעות טקסט רגילות ומנותבים לפי הטבלה הזו
+_HE_ALIASES = {
+    "מנוי": subscribe,
+    "בטל_מנוי": unsubscribe,
+    "מה_נשמע": whatsup,
+    "מצב": status,
+    "היום": today,
+}
+_HE_CMD_RE = r"^/(מנוי|בטל_מנוי|מה_נשמע|מצב|היום)(@\S+)?(\s|$)"
+
+async def _hebrew_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    cmd = update.effective_message.text.split()[0].lstrip("/").split("@", 1)[0]
+    handler = _HE_ALIASES.get(cmd)
+    if handler:
+        await handler(update, context)
+
 def parse_config_args(args: List[str]) -> Dict[str, Any]:
     # תומך: country=..., impact=high|all, poll=<int>, window=<int>, tz=<IANA TZ>
     out: Dict[str, Any] = {}
@@ -377,7 +508,6 @@ def parse_config_args(args: List[str]) -> Dict[str, Any]:
     return out
 
 async def config_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    global SCHEDULER
     cfg = get_config()
     new_vals = parse_config_args(context.args or [])
     if not new_vals:
@@ -390,11 +520,10 @@ async def config_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     _save_json(CONFIG_FILE, cfg)
 
     # עדכון תדירות הפולינג בזמן אמת
-    if SCHEDULER and SCHEDULER.get_job(SCHED_JOB_ID):
-        try:
-            SCHEDULER.reschedule_job(SCHED_JOB_ID, trigger=IntervalTrigger(seconds=cfg["poll_every_seconds"]))
-        except Exception as e:
-            await context.bot.send_message(chat_id=update.effective_chat.id, text=f"שגיאה בעדכון תדירות: {e}")
+    try:
+        _schedule_poll_job(context.application, cfg["poll_every_seconds"])
+    except Exception as e:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"שגיאה בעדכון תדירות: {e}")
 
     await context.bot.send_message(chat_id=update.effective_chat.id, text=(
         "עודכן בהצלחה:\n"
@@ -402,45 +531,92 @@ async def config_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         f"Poll={cfg['poll_every_seconds']}s, Window={cfg['window_minutes']}m, TZ={cfg['local_tz']}"
     ))
 
-def main() -> None:
-    global SCHEDULER, APPLICATION
-    APPLICATION = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-
-    # פקודות
-    APPLICATION.add_handler(CommandHandler("start", start))
-    APPLICATION.add_handler(CommandHandler("help", help_cmd))
-    APPLICATION.add_handler(CommandHandler("subscribe", subscribe))
-    APPLICATION.add_handler(CommandHandler("unsubscribe", unsubscribe))
-    APPLICATION.add_handler(CommandHandler("status", status))
-    APPLICATION.add_handler(CommandHandler("ping", ping))
-    APPLICATION.add_handler(CommandHandler("מנוי", subscribe))
-    APPLICATION.add_handler(CommandHandler("בטל_מנוי", unsubscribe))
-    APPLICATION.add_handler(CommandHandler("מה_נשמע", whatsup))
-    APPLICATION.add_handler(CommandHandler("מצב", status))      # alias עברית
-    APPLICATION.add_handler(CommandHandler("היום", today))
-    APPLICATION.add_handler(CommandHandler("config", config_cmd))
-    APPLICATION.add_handler(CommandHandler("help_he", help_cmd))  # אופציונלי
-
-    # Scheduler
-    cfg = get_config()
-    SCHEDULER = BackgroundScheduler(timezone=timezone.utc)
-    SCHEDULER.add_job(
+def _schedule_poll_job(application: Application, interval_seconds: int) -> None:
+    for job in application.job_queue.get_jobs_by_name(SCHED_JOB_ID):
+        job.schedule_removal()
+    application.job_queue.run_repeating(
         poll_and_notify,
-        trigger=IntervalTrigger(seconds=cfg["poll_every_seconds"]),
-        args=[APPLICATION],
-        id=SCHED_JOB_ID,
-        max_instances=1,
-        coalesce=True,
-        misfire_grace_time=30,
+        interval=interval_seconds,
+        first=5,
+        name=SCHED_JOB_ID,
     )
-    SCHEDULER.start()
 
-    print("Bot started. Press Ctrl+C to stop.")
+def _build_application() -> Application:
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        # pool בגודל שמכסה את 30 השליחות המקביליות של poll_and_notify
+        .connection_pool_size(32)
+        .pool_timeout(10)
+        .build()
+    )
+
+    # פקודות
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_cmd))
+    application.add_handler(CommandHandler("subscribe", subscribe))
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe))
+    application.add_handler(CommandHandler("status", status))
+    application.add_handler(CommandHandler("ping", ping))
+    application.add_handler(MessageHandler(filters.Regex(_HE_CMD_RE), _hebrew_command))
+    application.add_handler(CommandHandler("config", config_cmd))
+    application.add_handler(CommandHandler("help_he", help_cmd))  # אופציונלי
+
+    # פולינג על ה-JobQueue של PTB — אותו event loop, בלי thread נוסף
+    cfg = get_config()
+    _schedule_poll_job(application, cfg["poll_every_seconds"])
+    return application
+
+async def main() -> None:
+    """מריץ את הבוט על ה-event loop הנוכחי עד שה-task מבוטל (או Ctrl+C)."""
+    global APPLICATION
+    APPLICATION = _build_application()
+    async with APPLICATION:
+        await APPLICATION.start()
+        await APPLICATION.updater.start_polling()
+        print("Bot started.")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            if APPLICATION.updater.running:
+                await APPLICATION.updater.stop()
+            if APPLICATION.running:
+                await APPLICATION.stop()
+            await provider.aclose()
+
+async def run_webhook(public_url: str, secret: str) -> None:
+    """מצב webhook: טלגרם דוחף עדכונים אל השרת דרך update_queue —
+    בלי לולאת getUpdates ובלי בעיית ה-Conflict של polling כפול."""
+    global APPLICATION
+    APPLICATION = _build_application()
+    async with APPLICATION:
+        await APPLICATION.start()
+        await APPLICATION.bot.set_webhook(url=f"{public_url.rstrip('/')}/telegram/{secret}")
+        print("Bot started (webhook mode).")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            if APPLICATION.running:
+                await APPLICATION.stop()
+            await provider.aclose()
+
+async def _run_standalone() -> None:
+    # run_polling היה מתקין handlers ל-SIGINT/SIGTERM; asyncio.run לבדו
+    # מטפל רק ב-SIGINT, ו-SIGTERM (rollover של דיפלוי) היה הורג את התהליך
+    # בלי להריץ את ה-finally של main ואת ה-atexit — משאיר long-poll פתוח
+    # ועד 5 דקות של processed שלא נכתבו (ומכאן התראות כפולות אחרי restart).
+    # לכן SIGTERM מבטל כאן את ה-task כדי שהניקוי הרגיל ירוץ.
+    task = asyncio.create_task(main())
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, task.cancel)
+    except NotImplementedError:  # Windows
+        pass
     try:
-        APPLICATION.run_polling(close_loop=False)
-    finally:
-        SCHEDULER.shutdown(wait=False)
+        await task
+    except asyncio.CancelledError:
+        pass
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(_run_standalone())
 
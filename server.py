@@ -1,29 +1,92 @@
-import threading, asyncio
-from fastapi import FastAPI
+import asyncio
+import hmac
+import os
+import sys
+from contextlib import asynccontextmanager
+
+if sys.platform != "win32":
+    import uvloop
+    uvloop.install()
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response
+from starlette.routing import Route
+from telegram import Update
+
+import macro_copilot_mvp as bot
 from macro_copilot_mvp import main as run_bot
 
-app = FastAPI()
-_started = False
+# כשמוגדרים PUBLIC_URL + WEBHOOK_SECRET הבוט עובר למצב webhook:
+# טלגרם דוחף עדכונים ל-POST /telegram/{secret} במקום לולאת polling
+PUBLIC_URL = os.getenv("PUBLIC_URL", "").rstrip("/")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# הצמדת התהליך לליבה אחת — opt-in בלבד דרך PIN_CPU, כדי לא להפריע
+# למארחים משותפים; מצמצם jitter של ה-scheduler בנתיב ה-probe
+_pin_cpu = os.getenv("PIN_CPU")
+if _pin_cpu and hasattr(os, "sched_setaffinity"):
+    try:
+        os.sched_setaffinity(0, {int(_pin_cpu)})
+    except (ValueError, OSError) as e:
+        print(f"[server] PIN_CPU ignored: {e}")
+
+# תשובות קבועות מקודדות פעם אחת בזמן import — בלי jsonable_encoder
+# ובלי json.dumps על כל probe
+_ROOT = Response(b'{"ok":true,"service":"macro-copilot","bot":"running"}', media_type="application/json")
+_HEALTH = Response(b'{"ok":true}', media_type="application/json")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # הבוט רץ כ-task על אותו event loop של השרת — בלי thread ובלי loop שני.
+    # ה-lifespan רץ פעם אחת בכל process; במצב polling אסור להריץ את השירות
+    # עם יותר מ-worker אחד, אחרת טלגרם יחזיר Conflict על getUpdates כפול.
+    if PUBLIC_URL and WEBHOOK_SECRET:
+        task = asyncio.create_task(bot.run_webhook(PUBLIC_URL, WEBHOOK_SECRET))
+    else:
+        task = asyncio.create_task(run_bot())
+    yield
+    # ביטול מסודר: main() עוצר את ה-updater ואת ה-Application לפני שה-task
+    # מסתיים, כך שה-long-poll מול טלגרם נסגר מיד ולא מחכה ל-timeout בצד השרת
+    task.cancel()
+    try:
+        await asyncio.wait_for(task, timeout=10)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        pass
+
+
+# OpenAPI/Swagger רק מחוץ ל-prod — לשירות עם שני endpoints אין מה לבנות סכמה
+_SHOW_DOCS = os.getenv("ENV", "prod") != "prod"
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    docs_url="/docs" if _SHOW_DOCS else None,
+    redoc_url="/redoc" if _SHOW_DOCS else None,
+    openapi_url="/openapi.json" if _SHOW_DOCS else None,
+)
+
+
+# async def — אחרת Starlette מריץ כל probe דרך ה-anyio threadpool
+@app.get("/", response_class=Response, include_in_schema=False)
+async def root():
+    return _ROOT
 
-def _start_bot():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    run_bot()
 
-@app.on_event("startup")
-def on_startup():
-    global _started
-    if not _started:
-        t = threading.Thread(target=_start_bot, daemon=True)
-        t.start()
-        _started = True
+# /health כ-Route של Starlette — עוקף את solve_dependencies ואת
+# serialize_response של FastAPI לגמרי בנתיב ה-probe החם ביותר
+async def health(request):
+    return _HEALTH
 
-@app.get("/")
-def root():
-    return {"ok": True, "service": "macro-copilot", "bot": "running"}
 
-@app.get("/health")
-def health():
-    return {"ok": True}
+app.router.routes.append(Route("/health", health))
 
 
+@app.post("/telegram/{secret}", response_class=Response, include_in_schema=False)
+async def telegram_webhook(secret: str, request: Request):
+    if not WEBHOOK_SECRET or not hmac.compare_digest(secret, WEBHOOK_SECRET):
+        raise HTTPException(status_code=403)
+    application = bot.APPLICATION
+    if application is None:
+        raise HTTPException(status_code=503)
+    await application.update_queue.put(Update.de_json(await request.json(), application.bot))
+    return _HEALTH